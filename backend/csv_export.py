@@ -0,0 +1,25 @@
+# backend/csv_export.py
+# Purpose: shared CSV streaming for the /tsfview/export and /views/export endpoints.
+# Postgres renders the CSV via COPY (quoting, NULLs, dates), so no per-cell
+# formatting runs in Python; we only re-chunk the already-encoded bytes.
+
+from typing import AsyncIterator, Sequence
+
+CHUNK_SIZE = 64 * 1024  # bytes per StreamingResponse chunk; one ASGI send per chunk, not per row
+
+
+async def copy_csv_chunks(connect, copy_sql: str, params: Sequence[object]) -> AsyncIterator[bytes]:
+    """Yield `COPY ... TO STDOUT WITH (FORMAT CSV)` output in ~CHUNK_SIZE byte chunks.
+
+    `connect` is the router's _connect(); the connection is held only while streaming.
+    """
+    async with connect() as conn, conn.cursor() as cur:
+        async with cur.copy(copy_sql, params) as copy:
+            buf = bytearray()
+            async for data in copy:
+                buf += data
+                if len(buf) >= CHUNK_SIZE:
+                    yield bytes(buf)
+                    buf.clear()
+            if buf:
+                yield bytes(buf)
@@ -0,0 +1,80 @@
+# backend/pools.py
+# Purpose: process-wide psycopg connection pools shared by the raw-psycopg routers.
+# Pools are created closed at import and opened/closed by backend.main on startup/shutdown.
+
+import os
+from psycopg.types.numeric import FloatLoader
+from psycopg_pool import AsyncConnectionPool
+
+
+def engine_db_url() -> str:
+    return (
+        os.getenv("ENGINE_DATABASE_URL_DIRECT")
+        or os.getenv("ENGINE_DATABASE_URL")
+        or os.getenv("DATABASE_URL")
+        or ""
+    )
+
+
+def walmart_read_db_url() -> str:
+    # The dashboard only reads, so it can run against a replica (or a PgBouncer in front
+    # of replicas) and stay off the primary while the ETL writes.
+    return os.getenv("WALMART_DATABASE_READ_URL") or os.getenv("WALMART_DATABASE_URL") or ""
+
+
+def _kwargs(prepare_env: str) -> dict:
+    kwargs = {"autocommit": True}
+    # The routers run their queries with prepare=True. PgBouncer in transaction pooling
+    # mode only supports that from 1.21 with max_prepared_statements set; for older or
+    # unconfigured bouncers, setting `prepare_env` to 0 turns preparing off.
+    if os.getenv(prepare_env, "").lower() in ("0", "false", "no"):
+        kwargs["prepare_threshold"] = None
+    return kwargs
+
+
+async def _numeric_as_float(conn) -> None:
+    # NUMERIC columns load as float instead of Decimal: orjson (the app's default
+    # response encoder) serializes float natively but cannot encode Decimal.
+    conn.adapters.register_loader("numeric", FloatLoader)
+
+
+# engine.* views (tsfview, views); async so handlers don't tie up threadpool workers
+# while waiting on Postgres. check= mirrors pool_pre_ping in backend/database.py:
+# Neon drops idle connections when the compute suspends.
+ENGINE_POOL = AsyncConnectionPool(
+    engine_db_url(),
+    min_size=4,
+    max_size=20,
+    kwargs=_kwargs("ENGINE_DATABASE_PREPARE"),
+    configure=_numeric_as_float,
+    check=AsyncConnectionPool.check_connection,
+    open=False,
+    name="engine",
+)
+
+# Walmart dashboard tables (backend/routes/walmart_dashboard.py, read-only); async like ENGINE_POOL.
+WALMART_READ_POOL = AsyncConnectionPool(
+    walmart_read_db_url(),
+    min_size=4,
+    max_size=32,
+    kwargs=_kwargs("WALMART_DATABASE_READ_PREPARE"),
+    configure=_numeric_as_float,
+    check=AsyncConnectionPool.check_connection,
+    open=False,
+    name="walmart-read",
+)
+
+_POOLS = [ENGINE_POOL, WALMART_READ_POOL]
+
+
+async def open_pools() -> None:
+    for pool in _POOLS:
+        # An unset URL would make libpq fall back to localhost; leave the pool closed
+        # and let the routers raise "Database URL not configured" as before.
+        if pool.conninfo:
+            await pool.open()
+
+
+async def close_pools() -> None:
+    for pool in _POOLS:
+        await pool.close()
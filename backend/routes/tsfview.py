@@ -3,50 +3,79 @@
 # Version: 2025-10-05 v2.1
 # Adds GET "/" so /tsfview returns rows (not 404). Still provides /columns, /query, /export.
 
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
-import os, datetime as dt
-import psycopg
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import datetime as dt, itertools
 from psycopg.rows import dict_row
 
-router = APIRouter(prefix="/tsfview", tags=["tsfview"])
+from backend.csv_export import copy_csv_chunks
+from backend.pools import ENGINE_POOL
 
-def _db_url() -> str:
-    return (
-        os.getenv("ENGINE_DATABASE_URL_DIRECT")
-        or os.getenv("ENGINE_DATABASE_URL")
-        or os.getenv("DATABASE_URL")
-        or ""
-    )
+router = APIRouter(prefix="/tsfview", tags=["tsfview"])
 
 def _connect():
-    dsn = _db_url()
-    if not dsn:
+    if not ENGINE_POOL.conninfo:
         raise RuntimeError("Database URL not configured")
-    return psycopg.connect(dsn, autocommit=True)
+    return ENGINE_POOL.connection()
 
 def _parse_date(s: Optional[str]) -> Optional[dt.date]:
     return dt.date.fromisoformat(s) if s else None
 
+# --- SQL for the optional (forecast_id, date_from, date_to) filters, built once ---
+# Keyed by which filters are present; stable text lets prepare=True reuse server-side plans.
+FilterKey = Tuple[bool, bool, bool]
+
+def _from_where(key: FilterKey) -> str:
+    by_forecast, has_from, has_to = key
+    conds = ["TRUE"]
+    join = ""
+    if by_forecast:
+        join = "JOIN engine.forecast_registry fr ON fr.forecast_name = v.forecast_name"
+        conds.append("fr.forecast_id = %s")
+    if has_from:
+        conds.append("v.date >= %s")
+    if has_to:
+        conds.append("v.date <= %s")
+    return f"FROM engine.tsf_vw_full v {join} WHERE {' AND '.join(conds)}"
+
+_FILTER_KEYS = list(itertools.product((False, True), repeat=3))
+# COUNT(*) OVER () rides along with the page, so one round-trip returns both.
+_PAGE_SQL = {k: f"SELECT v.*, COUNT(*) OVER () AS _total {_from_where(k)} ORDER BY v.date ASC LIMIT %s OFFSET %s"
+             for k in _FILTER_KEYS}
+_COUNT_SQL = {k: f"SELECT COUNT(*) {_from_where(k)}" for k in _FILTER_KEYS}
+_EXPORT_SQL = {k: f"COPY (SELECT v.* {_from_where(k)} ORDER BY v.date ASC) TO STDOUT WITH (FORMAT CSV, HEADER TRUE)"
+               for k in _FILTER_KEYS}
+
+def _filters(forecast_id: Optional[str], date_from: Optional[str], date_to: Optional[str]):
+    """(filter key, params) for the optional filters, params in placeholder order."""
+    params: List[object] = []
+    if forecast_id:
+        params.append(forecast_id)
+    if date_from:
+        params.append(_parse_date(date_from))
+    if date_to:
+        params.append(_parse_date(date_to))
+    return (bool(forecast_id), bool(date_from), bool(date_to)), params
+
 @router.get("/")
-def root(page_size: int = 100):
+async def root(page_size: int = 100):
     """Quick browse: first N rows of engine.tsf_vw_full (all columns)."""
     limit = max(1, min(1000, int(page_size or 100)))
     sql = "SELECT v.* FROM engine.tsf_vw_full v ORDER BY v.date ASC LIMIT %s"
-    with _connect() as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(sql, [limit])
-        rows = [dict(r) for r in cur.fetchall()]
+    async with _connect() as conn, conn.cursor(row_factory=dict_row) as cur:
+        await cur.execute(sql, [limit], prepare=True)
+        rows = await cur.fetchall()
     return {"rows": rows, "limit": limit}
 
 @router.get("/columns")
-def columns():
-    with _connect() as conn, conn.cursor() as cur:
-        cur.execute("SELECT * FROM engine.tsf_vw_full LIMIT 0")
+async def columns():
+    async with _connect() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT * FROM engine.tsf_vw_full LIMIT 0")
         return {"columns": [d.name for d in cur.description]}
 
 @router.post("/query")
-def query_all(
+async def query_all(
     forecast_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
@@ -56,89 +85,37 @@ def query_all(
     limit = max(1, min(20000, int(page_size or 5000)))
     offset = max(0, (max(1, int(page or 1)) - 1) * limit)
 
-    conds = ["TRUE"]
-    params: List[object] = []
-    join = ""
-
-    if forecast_id:
-        join = "JOIN engine.forecast_registry fr ON fr.forecast_name = v.forecast_name"
-        conds.append("fr.forecast_id = %s")
-        params.append(forecast_id)
-
-    if date_from:
-        conds.append("v.date >= %s")
-        params.append(_parse_date(date_from))
-    if date_to:
-        conds.append("v.date <= %s")
-        params.append(_parse_date(date_to))
-
-    where_clause = " AND ".join(conds)
+    key, params = _filters(forecast_id, date_from, date_to)
 
-    sql_count = f"SELECT COUNT(*) FROM engine.tsf_vw_full v {join} WHERE {where_clause}"
-    sql = f"""
-        SELECT v.*
-        FROM engine.tsf_vw_full v
-        {join}
-        WHERE {where_clause}
-        ORDER BY v.date ASC
-        LIMIT %s OFFSET %s
-    """
+    async with _connect() as conn, conn.cursor(row_factory=dict_row) as cur:
+        await cur.execute(_PAGE_SQL[key], params + [limit, offset], prepare=True)
+        rows = await cur.fetchall()  # dict_row already yields plain dicts
+        if rows:
+            total = int(rows[0]["_total"])
+        elif offset:
+            # Past the last page there is no row to carry the window count.
+            await cur.execute(_COUNT_SQL[key], params, prepare=True)
+            total = int((await cur.fetchone())["count"])
+        else:
+            total = 0
 
-    with _connect() as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(sql_count, params)
-        total = int(cur.fetchone()["count"])
-        cur.execute(sql, params + [limit, offset])
-        rows = [dict(r) for r in cur.fetchall()]
+    for r in rows:
+        del r["_total"]
 
-    return {"total": total, "rows": rows, "page": page, "page_size": limit}
+    # Returned directly so FastAPI skips jsonable_encoder's per-value walk of the rows.
+    return ORJSONResponse({"total": total, "rows": rows, "page": page, "page_size": limit})
 
 @router.get("/export")
-def export_csv(
+async def export_csv(
     forecast_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
 ):
-    conds = ["TRUE"]
-    params: List[object] = []
-    join = ""
-
-    if forecast_id:
-        join = "JOIN engine.forecast_registry fr ON fr.forecast_name = v.forecast_name"
-        conds.append("fr.forecast_id = %s")
-        params.append(forecast_id)
-
-    if date_from:
-        conds.append("v.date >= %s")
-        params.append(_parse_date(date_from))
-    if date_to:
-        conds.append("v.date <= %s")
-        params.append(_parse_date(date_to))
-
-    where_clause = " AND ".join(conds)
-    sql = f"SELECT v.* FROM engine.tsf_vw_full v {join} WHERE {where_clause} ORDER BY v.date ASC"
-
-    def row_iter():
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(sql, params)
-            headers = [d.name for d in cur.description]
-            yield (",".join(headers) + "\\n").encode("utf-8")
-            for rec in cur:
-                out = []
-                for val in rec:
-                    if val is None:
-                        out.append("")
-                    elif isinstance(val, dt.date):
-                        out.append(val.isoformat())
-                    else:
-                        s = str(val)
-                        if any(ch in s for ch in [",", "\\n", '"']):
-                            s = '"' + s.replace('"','""') + '"'
-                        out.append(s)
-                yield (",".join(out) + "\\n").encode("utf-8")
+    key, params = _filters(forecast_id, date_from, date_to)
 
     fname = "tsf_vw_full.csv" if not forecast_id else f"tsf_vw_full_{forecast_id}.csv"
     return StreamingResponse(
-        row_iter(),
+        copy_csv_chunks(_connect, _EXPORT_SQL[key], params),
         media_type="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{fname}"'}
     )
@@ -1,12 +1,14 @@
 
 # backend/routes/views.py
 # Version: 2025-10-05 v7.0 — Month+Span UI; correct query against engine.tsf_vw_full
-from typing import Dict, List
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import HTMLResponse, StreamingResponse
-import os, datetime as dt, json
-import psycopg
-from psycopg.rows import dict_row
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, Response, StreamingResponse
+import datetime as dt, json, hashlib
+from cachetools import TTLCache
+
+from backend.csv_export import copy_csv_chunks
+from backend.pools import ENGINE_POOL
 
 router = APIRouter(prefix="/views", tags=["views"])
 
@@ -23,14 +25,52 @@ def _select_list(cols: list[str]) -> str:
             quoted.append(c)
     return ", ".join(quoted)
 
-def _db_url() -> str:
-    return os.getenv("ENGINE_DATABASE_URL_DIRECT") or os.getenv("ENGINE_DATABASE_URL") or os.getenv("DATABASE_URL") or ""
+# Month-span query shared by /query and /export; built once so the text is stable
+# for prepare=True.
+_RANGE_SQL = f"""
+    SELECT {_select_list(COLS)}
+    FROM engine.tsf_vw_full
+    WHERE forecast_name = %s
+      AND date >= %s AND date < %s
+    ORDER BY date ASC
+"""
+_EXPORT_SQL = f"COPY ({_RANGE_SQL}) TO STDOUT WITH (FORMAT CSV, HEADER TRUE)"
+_COLS_TUPLE = tuple(COLS)  # _RANGE_SQL selects exactly COLS, in order
 
 def _connect():
-    dsn = _db_url()
-    if not dsn:
+    if not ENGINE_POOL.conninfo:
         raise RuntimeError("Database URL not configured")
-    return psycopg.connect(dsn, autocommit=True)
+    return ENGINE_POOL.connection()
+
+_CACHE_CONTROL = "public, max-age=300"
+
+def _etag(key: str) -> str:
+    return '"' + hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + '"'
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 when the client's If-None-Match already carries `etag`, else None."""
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip().removeprefix("W/") for t in inm.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL})
+    return None
+
+def _etag_json(result, etag: str) -> JSONResponse:
+    return JSONResponse(result, headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL})
+
+# Per-worker (result, etag) cache for the picker lists: repeat loads within the TTL
+# skip Postgres entirely. Nothing in this router writes to engine.*, so TTL expiry
+# is the only invalidation.
+_CACHE: TTLCache = TTLCache(maxsize=256, ttl=300)
+
+def _arrow_stream(names: List[str], rows: List[tuple]) -> bytes:
+    """Arrow IPC stream of a columnar table built from tuple rows."""
+    import pyarrow as pa  # only ?format=arrow needs it; keeps it out of every worker's startup
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    table = pa.table({n: pa.array(c) for n, c in zip(names, columns)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
 
 def _ym_first(ym: str) -> dt.date:
     y, m = ym.split("-")
@@ -105,68 +145,80 @@ def page():
     return HTMLResponse(html)
 
 @router.get("/forecasts")
-def forecasts():
-    with _connect() as conn, conn.cursor() as cur:
-        cur.execute("SELECT DISTINCT forecast_name FROM engine.tsf_vw_full ORDER BY 1")
-        return [r[0] for r in cur.fetchall()]
+async def forecasts(request: Request):
+    hit = _CACHE.get(("forecasts",))
+    if hit is None:
+        async with _connect() as conn, conn.cursor() as cur:
+            # Read names from the small registry rather than DISTINCT over the whole view;
+            # EXISTS (an index probe on forecast_name) keeps registered-but-empty forecasts out.
+            await cur.execute("""
+                SELECT DISTINCT fr.forecast_name
+                FROM engine.forecast_registry fr
+                WHERE EXISTS (SELECT 1 FROM engine.tsf_vw_full v WHERE v.forecast_name = fr.forecast_name)
+                ORDER BY 1
+            """, prepare=True)
+            result = [r[0] for r in await cur.fetchall()]
+        hit = _CACHE[("forecasts",)] = (result, _etag(json.dumps(result)))
+    result, etag = hit
+    return _not_modified(request, etag) or _etag_json(result, etag)
 
 @router.get("/months")
-def months(forecast_name: str):
-    with _connect() as conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT to_char(date_trunc('month', date), 'YYYY-MM') AS ym
-            FROM engine.tsf_vw_full
-            WHERE forecast_name = %s
-            GROUP BY ym
-            ORDER BY ym
-        """, [forecast_name])
-        return [r[0] for r in cur.fetchall()]
+async def months(request: Request, forecast_name: str):
+    key = ("months", forecast_name)
+    # (None, etag) records a miss answered with 304: the etag is known, the list not yet loaded.
+    result, etag = _CACHE.get(key, (None, None))
+    if etag is not None:
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+    if result is None:
+        async with _connect() as conn, conn.cursor() as cur:
+            if etag is None:
+                # Key the etag on both ends of the date range so a re-run that adds earlier
+                # history changes it too; two endpoint probes on the (forecast_name, date)
+                # index, far cheaper than the GROUP BY below.
+                await cur.execute("SELECT min(date), max(date) FROM engine.tsf_vw_full WHERE forecast_name = %s",
+                                  [forecast_name], prepare=True)
+                first, last = await cur.fetchone()
+                etag = _etag(json.dumps([forecast_name, str(first), str(last)]))
+                not_modified = _not_modified(request, etag)
+                if not_modified:
+                    _CACHE[key] = (None, etag)
+                    return not_modified
+            await cur.execute("""
+                SELECT to_char(date_trunc('month', date), 'YYYY-MM') AS ym
+                FROM engine.tsf_vw_full
+                WHERE forecast_name = %s
+                GROUP BY ym
+                ORDER BY ym
+            """, [forecast_name], prepare=True)
+            result = [r[0] for r in await cur.fetchall()]
+        _CACHE[key] = (result, etag)
+    return _etag_json(result, etag)
 
 @router.post("/query")
-def query(payload: Dict):
+async def query(payload: Dict, format: str = Query("json", pattern="^(json|arrow)$")):
     forecast_name = payload.get("forecast_name")
     month = payload.get("month")
     span = int(payload.get("span") or 1)
     if not forecast_name or not month:
         raise HTTPException(status_code=400, detail="forecast_name and month are required")
     start, stop = _range_from_month_span(month, span)
-    sql = f"""
-        SELECT {_select_list(COLS)}
-        FROM engine.tsf_vw_full
-        WHERE forecast_name = %s
-          AND date >= %s AND date < %s
-        ORDER BY date ASC
-    """
-    with _connect() as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(sql, [forecast_name, start, stop])
-        rows = [dict(r) for r in cur.fetchall()]
-    return {"rows": rows, "total": len(rows)}
+    async with _connect() as conn, conn.cursor() as cur:
+        await cur.execute(_RANGE_SQL, [forecast_name, start, stop], prepare=True)
+        rows = await cur.fetchall()
+    if format == "arrow":
+        # Typed, columnar payload (pyarrow.ipc.open_stream / pandas-loadable) without
+        # repeating every column name per row as the JSON shape does.
+        return Response(_arrow_stream(COLS, rows), media_type="application/vnd.apache.arrow.stream")
+    # Tuple rows zipped onto one shared key tuple: cheaper than dict_row building each dict.
+    rows = [dict(zip(_COLS_TUPLE, r)) for r in rows]
+    # Returned directly so FastAPI skips jsonable_encoder's per-value walk of the rows.
+    return ORJSONResponse({"rows": rows, "total": len(rows)})
 
 @router.get("/export")
-def export(forecast_name: str, month: str, span: int = 1):
+async def export(forecast_name: str, month: str, span: int = 1):
     start, stop = _range_from_month_span(month, int(span))
-    sql = f"""
-        SELECT {_select_list(COLS)}
-        FROM engine.tsf_vw_full
-        WHERE forecast_name = %s
-          AND date >= %s AND date < %s
-        ORDER BY date ASC
-    """
-    def row_iter():
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(sql, [forecast_name, start, stop])
-            headers = [d.name for d in cur.description]
-            yield (",".join(headers) + "\\n").encode("utf-8")
-            for rec in cur:
-                out = []
-                for v in rec:
-                    if v is None: out.append("")
-                    elif hasattr(v, "isoformat"): out.append(v.isoformat())
-                    else:
-                        s = str(v)
-                        if any(ch in s for ch in [",","\\n","\""]): s = '\"' + s.replace('\"','\"\"') + '\"'
-                        out.append(s)
-                yield (",".join(out) + "\\n").encode("utf-8")
     fname = f"tsf_vw_full_{forecast_name}_{month}_x{span}.csv".replace(" ","_")
-    return StreamingResponse(row_iter(), media_type="text/csv",
+    return StreamingResponse(copy_csv_chunks(_connect, _EXPORT_SQL, [forecast_name, start, stop]), media_type="text/csv",
                              headers={"Content-Disposition": f"attachment; filename=\"{fname}\""})
@@ -3,12 +3,19 @@
 # Band break analysis for demand planning
 
 from typing import Dict, List, Optional
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from datetime import datetime, timedelta, date
 from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+from dataclasses import dataclass
 import os
-import psycopg
-from psycopg.rows import dict_row
+from cachetools import TTLCache
+from psycopg import sql
+from psycopg.rows import class_row
+
+from backend.pools import WALMART_READ_POOL
 
 router = APIRouter(prefix="/api/walmart", tags=["walmart-dashboard"])
 
@@ -19,11 +26,17 @@ if not WALMART_DATABASE_URL:
 
 
 def _connect():
-    return psycopg.connect(WALMART_DATABASE_URL, autocommit=True)
+    # Borrow from the shared pool (opened on app startup) instead of a fresh
+    # TCP/TLS/auth handshake per request; the connection returns on exit.
+    return WALMART_READ_POOL.connection()
 
 
 def to_date(val):
     """Convert various date types to date object."""
+    # Fast path: psycopg already returns datetime.date; an exact class check avoids
+    # isinstance's MRO walk (and datetime, a date subclass, must not take this path).
+    if val.__class__ is date:
+        return val
     if val is None:
         return None
     if isinstance(val, datetime):
@@ -75,163 +88,410 @@ def get_period_range(week: str, forecast_type: str):
     return period_start, period_end
 
 
-def get_band_breaks(rows: List[Dict], week_date: date) -> Dict:
-    """Calculate band breaks from rows."""
-    breaks = {
-        'upper_85': 0, 'upper_95': 0,
-        'lower_85': 0, 'lower_95': 0,
-        'upper_85_consec': 0, 'lower_85_consec': 0,
-        'total_days': 0
-    }
-    
-    current_upper_consec = 0
-    current_lower_consec = 0
-    
-    sorted_rows = sorted([r for r in rows if to_date(r['date']) <= week_date], key=lambda x: to_date(x['date']))
-    
-    for row in sorted_rows:
-        val = row.get('value')
-        ci85_high = row.get('ci85_high')
-        ci85_low = row.get('ci85_low')
-        ci95_high = row.get('ci95_high')
-        ci95_low = row.get('ci95_low')
-        
-        if val is None:
-            continue
-            
-        breaks['total_days'] += 1
-        
-        if ci85_high is not None and val > ci85_high:
-            breaks['upper_85'] += 1
-            current_upper_consec += 1
-            breaks['upper_85_consec'] = max(breaks['upper_85_consec'], current_upper_consec)
-        else:
-            current_upper_consec = 0
-            
-        if ci95_high is not None and val > ci95_high:
-            breaks['upper_95'] += 1
-            
-        if ci85_low is not None and val < ci85_low:
-            breaks['lower_85'] += 1
-            current_lower_consec += 1
-            breaks['lower_85_consec'] = max(breaks['lower_85_consec'], current_lower_consec)
-        else:
-            current_lower_consec = 0
-            
-        if ci95_low is not None and val < ci95_low:
-            breaks['lower_95'] += 1
-    
-    return breaks
+BREAK_KEYS = ('upper_85', 'upper_95', 'lower_85', 'lower_95',
+              'upper_85_consec', 'lower_85_consec', 'total_days')
+
+
+def band_breaks_sql(table: str, item_col: str, where: str) -> str:
+    """SQL computing band breaks per (item_id, type_id) inside Postgres, plus the
+    window's SUM(value) as `total`.
+
+    NULL values are skipped (not counted, and they do not end a run); a NULL band
+    edge is never a break. Consecutive runs use gaps-and-islands: every non-breaking
+    day opens a new island, so a run is the breaking days that share an island number.
+
+    `table` is inserted verbatim: pass a _per_type placeholder such as '{agg}'.
+    """
+    return f'''
+        WITH w AS (
+            SELECT {item_col} AS item_id, type_id, date, value,
+                   (value > ci85_high) IS TRUE AS u85,
+                   (value > ci95_high) IS TRUE AS u95,
+                   (value < ci85_low) IS TRUE AS l85,
+                   (value < ci95_low) IS TRUE AS l95
+            FROM {table}
+            WHERE {where}
+        ), islands AS (
+            SELECT *,
+                   COUNT(*) FILTER (WHERE value IS NOT NULL AND NOT u85) OVER k AS u85_island,
+                   COUNT(*) FILTER (WHERE value IS NOT NULL AND NOT l85) OVER k AS l85_island
+            FROM w
+            WINDOW k AS (PARTITION BY item_id, type_id ORDER BY date ROWS UNBOUNDED PRECEDING)
+        ), runs AS (
+            SELECT *,
+                   COUNT(*) FILTER (WHERE u85) OVER (PARTITION BY item_id, type_id, u85_island) AS u85_run,
+                   COUNT(*) FILTER (WHERE l85) OVER (PARTITION BY item_id, type_id, l85_island) AS l85_run
+            FROM islands
+        )
+        SELECT item_id, type_id,
+               COUNT(*) FILTER (WHERE u85) AS upper_85,
+               COUNT(*) FILTER (WHERE u95) AS upper_95,
+               COUNT(*) FILTER (WHERE l85) AS lower_85,
+               COUNT(*) FILTER (WHERE l95) AS lower_95,
+               MAX(u85_run) AS upper_85_consec,
+               MAX(l85_run) AS lower_85_consec,
+               COUNT(value) AS total_days,
+               COALESCE(SUM(value), 0) AS total
+        FROM runs
+        GROUP BY item_id, type_id
+    '''
+
+
+def band_breaks_mv_sql(view: str, where: str) -> str:
+    """band_breaks_sql-shaped rows looked up in a precomputed view (sql/walmart_band_breaks.sql).
+
+    `view` is a _per_type placeholder such as '{mv}'. Parameters: the week-ending
+    date, then those of `where`.
+    """
+    return f'''
+        SELECT product_id AS item_id, type_id,
+               upper_85, upper_95, lower_85, lower_95,
+               upper_85_consec, lower_85_consec, total_days, total
+        FROM {view}
+        WHERE week_ending = %s
+          AND {where}
+    '''
+
+
+@dataclass(slots=True)
+class BreakRow:
+    """One band_breaks_sql row (loaded via class_row)."""
+    item_id: str
+    type_id: str
+    upper_85: int
+    upper_95: int
+    lower_85: int
+    lower_95: int
+    upper_85_consec: int
+    lower_85_consec: int
+    total_days: int
+    total: float
+
+    def breaks(self) -> Dict[str, int]:
+        return {
+            'upper_85': self.upper_85,
+            'upper_95': self.upper_95,
+            'lower_85': self.lower_85,
+            'lower_95': self.lower_95,
+            'upper_85_consec': self.upper_85_consec,
+            'lower_85_consec': self.lower_85_consec,
+            'total_days': self.total_days,
+        }
 
 
-def get_band_breaks_from_rows(rows: List[Dict], week_date: date) -> Dict:
-    """Wrapper for get_band_breaks that handles row format."""
-    return get_band_breaks(rows, week_date)
+def breaks_by_item(rows: List[BreakRow]) -> Dict[str, Dict[str, Dict]]:
+    """{item_id: {'U': breaks, 'R': breaks}} from band_breaks_sql rows; missing types are all zeros."""
+    out = defaultdict(lambda: {'U': dict.fromkeys(BREAK_KEYS, 0), 'R': dict.fromkeys(BREAK_KEYS, 0)})
+    for row in rows:
+        out[row.item_id][row.type_id] = row.breaks()
+    return out
 
 
-# =============================================================================
-# API ENDPOINTS
-# =============================================================================
+CHART_KEYS = ('date', 'actual', 'forecast', 'ci85_low', 'ci85_high', 'ci95_low', 'ci95_high')
+
+
+def chart_points(rows: List[tuple]) -> List[Dict]:
+    """Chart JSON from rows selected with _CHART_COLS (one value per CHART_KEYS entry).
+
+    Postgres already formats the date and hides actuals after the selected week (and
+    zero actuals), and the pool loads NUMERIC as float, so values pass through as-is.
+    """
+    return [dict(zip(CHART_KEYS, r)) for r in rows]
+
 
 def get_weeks_in_range(start_date, end_date):
     """Get all week-ending Saturdays in a date range."""
-    weeks = []
-    if isinstance(start_date, str):
-        current = datetime.strptime(start_date, '%Y-%m-%d')
-    else:
-        current = datetime.combine(start_date, datetime.min.time())
-    if isinstance(end_date, str):
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-    else:
-        end = datetime.combine(end_date, datetime.min.time())
-    
-    # Find first Saturday
-    days_until_saturday = (5 - current.weekday()) % 7
-    if days_until_saturday == 0 and current.weekday() != 5:
-        days_until_saturday = 7
-    current = current + timedelta(days=days_until_saturday)
-    
-    while current <= end:
-        weeks.append(current.strftime('%Y-%m-%d'))
-        current += timedelta(days=7)
-    
-    return weeks
+    start = to_date(start_date)
+    end = to_date(end_date)
+    # Saturdays sit on a fixed 7-day stride: find the first one, then step in ordinals.
+    first = start.toordinal() + (5 - start.weekday()) % 7
+    last = end.toordinal()
+    return [date.fromordinal(o).isoformat() for o in range(first, last + 1, 7)]
 
 
+# Trailing band-break window per forecast_type, ending at the selected week.
+WINDOW_DAYS = {'monthly': 30, 'quarterly': 90}
+FORECAST_TYPES = tuple(WINDOW_DAYS)
+
+
+# Per-worker cache for the picker lists (/weeks, /geo-ids): they only change when the
+# ETL loads new data, so new weeks or geo_ids show up within the 300 s TTL. Handlers
+# all run on the event loop, so no lock is needed.
+_CACHE: TTLCache = TTLCache(maxsize=64, ttl=300)
+_CACHE_HEADERS = {"Cache-Control": "public, max-age=300"}
+
+
+# Opt-in: serve /departments, /categories and /location-summary from the materialized
+# views in sql/walmart_band_breaks.sql. They hold Saturday week endings only, so any
+# other week still takes the live query.
+USE_BAND_BREAKS_MV = os.getenv("WALMART_BAND_BREAKS_MV", "").lower() in ("1", "true", "yes")
+
+
+def _check_forecast_type(forecast_type: str) -> None:
+    if forecast_type not in FORECAST_TYPES:
+        raise HTTPException(status_code=400, detail=f"forecast_type must be one of {', '.join(FORECAST_TYPES)}")
+
+
+async def _cached(key, load):
+    hit = _CACHE.get(key)
+    if hit is None:
+        hit = _CACHE[key] = await load()
+    return hit
+
+
+def _per_type(template: str) -> Dict[str, sql.Composed]:
+    """{forecast_type: SQL} with {agg} / {sku} / {mv} bound to that type's relations."""
+    return {ft: sql.SQL(template).format(agg=sql.Identifier(f"walmart_aggregate_{ft}"),
+                                         sku=sql.Identifier(f"walmart_ca_1_sku_final_{ft}"),
+                                         mv=sql.Identifier(f"walmart_band_breaks_{ft}"))
+            for ft in FORECAST_TYPES}
+
+
+async def _fetch_breaks(forecast_type: str, week: str, live: Dict[str, sql.Composed], params: List,
+                        mv: Optional[Dict[str, sql.Composed]] = None) -> List[BreakRow]:
+    """BreakRows for the WINDOW_DAYS window ending at `week`.
+
+    `live` SQL takes (window start, week, *params). With USE_BAND_BREAKS_MV set and a
+    Saturday week, `mv` SQL (week, *params) is used instead when given.
+    """
+    _check_forecast_type(forecast_type)
+    week_d = to_date(week)
+    async with _connect() as conn:
+        async with conn.cursor(row_factory=class_row(BreakRow)) as cur:
+            if mv is not None and USE_BAND_BREAKS_MV and week_d.weekday() == 5:
+                await cur.execute(mv[forecast_type], [week_d, *params], prepare=True)
+            else:
+                window_start = week_d - timedelta(days=WINDOW_DAYS[forecast_type] - 1)
+                await cur.execute(live[forecast_type], [window_start, week_d, *params], prepare=True)
+            return await cur.fetchall()
+
+
+async def _fetch_chart(query: sql.Composed, params: List) -> List[tuple]:
+    # A chart period is one month or quarter plus 14 days per series, so a plain
+    # prepared fetch is a single round-trip; a server-side cursor would only add
+    # DECLARE/FETCH/CLOSE and lose prepare=True.
+    async with _connect() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params, prepare=True)
+            return await cur.fetchall()
+
+
+async def chart_response(forecast_type: str, week: str, type_id: str, one: Dict[str, sql.Composed],
+                         both: Dict[str, sql.Composed], params: List) -> ORJSONResponse:
+    """Chart period around `week` for one type_id, or {"R": [...], "U": [...]} from a
+    single query when type_id asks for both (e.g. "UR")."""
+    _check_forecast_type(forecast_type)
+    week_date = to_date(week)
+    period_start, period_end = get_period_range(week, forecast_type)
+    if "U" in type_id and "R" in type_id:
+        rows = await _fetch_chart(both[forecast_type], [week_date, period_start, period_end, *params])
+        # Rows arrive ordered by type_id, so each series is one contiguous run.
+        series = {'R': [], 'U': []}
+        for tid, group in groupby(rows, key=itemgetter(0)):
+            series[tid] = chart_points([r[1:] for r in group])
+        return ORJSONResponse(series)
+    rows = await _fetch_chart(one[forecast_type], [week_date, period_start, period_end, type_id, *params])
+    return ORJSONResponse(chart_points(rows))
+
+
+# --- SQL per forecast_type, composed once at import ---
+# Table names can't be bind parameters, so each endpoint's SQL is composed once per
+# whitelisted forecast_type, with the names quoted by sql.Identifier. The stable text is
+# what lets prepare=True reuse the server-side plan on every later call on a pooled
+# connection.
+
+# The ISO date string and the hide-future/zero-actual rule are computed by Postgres;
+# the %s is the selected week.
+_CHART_COLS = """to_char(date, 'YYYY-MM-DD') AS date,
+           CASE WHEN date <= %s AND value <> 0 THEN value END AS actual,
+           fv as forecast, ci85_low, ci85_high, ci95_low, ci95_high"""
+
+
+def _chart_sql(rel: str, where: str):
+    """(single type_id, both U and R) chart SQL per forecast_type for `rel` rows matching `where`.
+
+    Parameters: the selected week, period start and end, the type_id (single variant
+    only), then those of `where`. ORDER BY names the table's date column because the
+    bare name would mean the to_char output.
+    """
+    one = _per_type(f'''
+    SELECT {_CHART_COLS}
+    FROM {rel}
+    WHERE date >= %s AND date <= %s 
+      AND type_id = %s
+      AND {where.strip()}
+    ORDER BY {rel}.date
+''')
+    both = _per_type(f'''
+    SELECT type_id, {_CHART_COLS}
+    FROM {rel}
+    WHERE date >= %s AND date <= %s 
+      AND type_id IN ('U', 'R')
+      AND {where.strip()}
+    ORDER BY type_id, {rel}.date
+''')
+    return one, both
+
+
+_WEEKS_SQL = _per_type('SELECT MIN(date), MAX(date) FROM {agg}')
+_GEO_IDS_SQL = _per_type('SELECT DISTINCT geo_id FROM {agg} WHERE geo_level = %s ORDER BY geo_id')
+_DEPARTMENTS_SQL = _per_type(band_breaks_sql('{agg}', 'product_id', '''
+    date >= %s AND date <= %s 
+      AND geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'department_id'
+'''))
+_CATEGORIES_SQL = _per_type(band_breaks_sql('{agg}', 'product_id', '''
+    date >= %s AND date <= %s 
+      AND geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'category_id'
+'''))
+_CATEGORIES_BY_DEPT_SQL = _per_type(band_breaks_sql('{agg}', 'product_id', '''
+    date >= %s AND date <= %s 
+      AND geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'category_id'
+      AND product_id LIKE %s
+'''))
+_DEPARTMENTS_MV_SQL = _per_type(band_breaks_mv_sql('{mv}', '''
+    geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'department_id'
+'''))
+_CATEGORIES_MV_SQL = _per_type(band_breaks_mv_sql('{mv}', '''
+    geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'category_id'
+'''))
+_CATEGORIES_BY_DEPT_MV_SQL = _per_type(band_breaks_mv_sql('{mv}', '''
+    geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'category_id'
+      AND product_id LIKE %s
+'''))
+_LOCATION_SUMMARY_MV_SQL = _per_type(band_breaks_mv_sql('{mv}', '''
+    geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'total'
+      AND product_id = 'ALL'
+'''))
+_LOCATION_SUMMARY_SQL = _per_type(band_breaks_sql('{agg}', 'product_id', '''
+    date >= %s AND date <= %s 
+      AND geo_level = %s 
+      AND geo_id = %s
+      AND product_level = 'total'
+      AND product_id = 'ALL'
+'''))
+_CHART_LOCATION_SQL, _CHART_LOCATION_UR_SQL = _chart_sql('{agg}', '''
+    geo_level = %s
+      AND geo_id = %s
+      AND product_level = 'total'
+      AND product_id = 'ALL'
+''')
+_CHART_DEPARTMENT_SQL, _CHART_DEPARTMENT_UR_SQL = _chart_sql('{agg}', '''
+    geo_level = %s
+      AND geo_id = %s
+      AND product_level = 'department_id'
+      AND product_id = %s
+''')
+_CHART_CATEGORY_SQL, _CHART_CATEGORY_UR_SQL = _chart_sql('{agg}', '''
+    geo_level = %s
+      AND geo_id = %s
+      AND product_level = 'category_id'
+      AND product_id = %s
+''')
+_SKU_LIST_SQL = _per_type('SELECT DISTINCT sku_id FROM {sku} ORDER BY sku_id LIMIT 1000')
+# Rank in SQL so only the top `limit` SKUs' break rows come back. Ties go to the lower
+# sku_id in the database's default collation, as the former ORDER BY sku_id did.
+_SKUS_SQL = _per_type('''
+    WITH b AS (''' + band_breaks_sql('{sku}', 'sku_id', '''
+        date >= %s AND date <= %s 
+          AND category_id = %s
+    ''') + '''), ranked AS (
+        SELECT item_id,
+               SUM(CASE type_id WHEN 'U' THEN upper_85 + lower_85
+                                WHEN 'R' THEN lower_85 ELSE 0 END) AS total_breaks
+        FROM b
+        GROUP BY item_id
+        ORDER BY total_breaks DESC, item_id
+        LIMIT %s
+    )
+    SELECT b.*
+    FROM b JOIN ranked USING (item_id)
+    ORDER BY ranked.total_breaks DESC, item_id
+''')
+_CHART_SKU_SQL, _CHART_SKU_UR_SQL = _chart_sql('{sku}', '''
+    sku_id = %s
+''')
+_SKU_INFO_SQL = _per_type(band_breaks_sql('{sku}', 'sku_id', '''
+    date >= %s AND date <= %s 
+      AND sku_id = %s
+'''))
+
+
+# =============================================================================
+# API ENDPOINTS
+# =============================================================================
+
 @router.get("/weeks")
-def get_weeks(forecast_type: str = "monthly"):
+async def get_weeks(forecast_type: str = "monthly"):
     """Get available weeks (Saturdays) for the forecast type."""
-    table = f"walmart_aggregate_{forecast_type}"
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            cur.execute(f'SELECT MIN(date), MAX(date) FROM "{table}"')
-            row = cur.fetchone()
-    
-    if row and row[0] and row[1]:
-        start_date = to_date(row[0])
-        end_date = to_date(row[1])
-        return get_weeks_in_range(start_date, end_date)
-    
-    return []
+    _check_forecast_type(forecast_type)
+
+    async def load():
+        async with _connect() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(_WEEKS_SQL[forecast_type], prepare=True)
+                row = await cur.fetchone()
+        
+        if row and row[0] and row[1]:
+            start_date = to_date(row[0])
+            end_date = to_date(row[1])
+            return get_weeks_in_range(start_date, end_date)
+        
+        return []
+
+    return ORJSONResponse(await _cached(("weeks", forecast_type), load), headers=_CACHE_HEADERS)
 
 
 @router.get("/geo-ids")
-def get_geo_ids(geo_level: str = "all_locations", forecast_type: str = "monthly"):
+async def get_geo_ids(geo_level: str = "all_locations", forecast_type: str = "monthly"):
     """Get geographic IDs for a level."""
-    table = f"walmart_aggregate_{forecast_type}"
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            if geo_level == "all_locations":
-                return ["ALL"]
-            cur.execute(f'SELECT DISTINCT geo_id FROM "{table}" WHERE geo_level = %s ORDER BY geo_id', [geo_level])
-            return [row[0] for row in cur.fetchall()]
+    _check_forecast_type(forecast_type)
+    if geo_level == "all_locations":
+        return ORJSONResponse(["ALL"], headers=_CACHE_HEADERS)
+
+    async def load():
+        async with _connect() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(_GEO_IDS_SQL[forecast_type], [geo_level], prepare=True)
+                return [row[0] for row in await cur.fetchall()]
+
+    return ORJSONResponse(await _cached(("geo-ids", forecast_type, geo_level), load), headers=_CACHE_HEADERS)
 
 
 @router.get("/departments")
-def get_departments(
+async def get_departments(
     week: str,
     forecast_type: str = "monthly",
     geo_level: str = "all_locations",
     geo_id: str = "ALL"
 ):
     """Get department band breaks."""
-    table = f"walmart_aggregate_{forecast_type}"
-    week_d = to_date(week)
-    window_days = 30 if forecast_type == 'monthly' else 90
-    window_start = week_d - timedelta(days=window_days - 1)
+    rows = await _fetch_breaks(forecast_type, week, _DEPARTMENTS_SQL, [geo_level, geo_id], mv=_DEPARTMENTS_MV_SQL)
     
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT product_id, type_id, date, value, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND geo_level = %s 
-                  AND geo_id = %s
-                  AND product_level = 'department_id'
-                ORDER BY product_id, type_id, date
-            ''', [window_start, week_d, geo_level, geo_id])
-            rows = cur.fetchall()
+    result = [{
+        'department_id': dept_id,
+        'units': breaks['U'],
+        'revenue': breaks['R']
+    } for dept_id, breaks in breaks_by_item(rows).items()]
     
-    dept_data = defaultdict(lambda: {'U': [], 'R': []})
-    for row in rows:
-        dept_data[row['product_id']][row['type_id']].append(dict(row))
-    
-    result = []
-    for dept_id, type_rows in dept_data.items():
-        units_breaks = get_band_breaks_from_rows(type_rows.get('U', []), week_d)
-        revenue_breaks = get_band_breaks_from_rows(type_rows.get('R', []), week_d)
-        result.append({
-            'department_id': dept_id,
-            'units': units_breaks,
-            'revenue': revenue_breaks
-        })
-    
-    return sorted(result, key=lambda x: x['department_id'])
+    return ORJSONResponse(sorted(result, key=lambda x: x['department_id']))
 
 
 @router.get("/categories")
-def get_categories(
+async def get_categories(
     week: str,
     forecast_type: str = "monthly",
     geo_level: str = "all_locations",
@@ -239,100 +499,46 @@ def get_categories(
     department_id: Optional[str] = None
 ):
     """Get category band breaks."""
-    table = f"walmart_aggregate_{forecast_type}"
-    week_d = to_date(week)
-    window_days = 30 if forecast_type == 'monthly' else 90
-    window_start = week_d - timedelta(days=window_days - 1)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            if department_id:
-                cur.execute(f'''
-                    SELECT product_id, type_id, date, value, ci85_low, ci85_high, ci95_low, ci95_high
-                    FROM "{table}"
-                    WHERE date >= %s AND date <= %s 
-                      AND geo_level = %s 
-                      AND geo_id = %s
-                      AND product_level = 'category_id'
-                      AND product_id LIKE %s
-                    ORDER BY product_id, type_id, date
-                ''', [window_start, week_d, geo_level, geo_id, f"{department_id}_%"])
-            else:
-                cur.execute(f'''
-                    SELECT product_id, type_id, date, value, ci85_low, ci85_high, ci95_low, ci95_high
-                    FROM "{table}"
-                    WHERE date >= %s AND date <= %s 
-                      AND geo_level = %s 
-                      AND geo_id = %s
-                      AND product_level = 'category_id'
-                    ORDER BY product_id, type_id, date
-                ''', [window_start, week_d, geo_level, geo_id])
-            rows = cur.fetchall()
-    
-    cat_data = defaultdict(lambda: {'U': [], 'R': []})
-    for row in rows:
-        cat_data[row['product_id']][row['type_id']].append(dict(row))
+    if department_id:
+        rows = await _fetch_breaks(forecast_type, week, _CATEGORIES_BY_DEPT_SQL,
+                                   [geo_level, geo_id, f"{department_id}_%"], mv=_CATEGORIES_BY_DEPT_MV_SQL)
+    else:
+        rows = await _fetch_breaks(forecast_type, week, _CATEGORIES_SQL, [geo_level, geo_id], mv=_CATEGORIES_MV_SQL)
     
-    result = []
-    for cat_id, type_rows in cat_data.items():
-        units_breaks = get_band_breaks_from_rows(type_rows.get('U', []), week_d)
-        revenue_breaks = get_band_breaks_from_rows(type_rows.get('R', []), week_d)
-        result.append({
-            'category_id': cat_id,
-            'units': units_breaks,
-            'revenue': revenue_breaks
-        })
+    result = [{
+        'category_id': cat_id,
+        'units': breaks['U'],
+        'revenue': breaks['R']
+    } for cat_id, breaks in breaks_by_item(rows).items()]
     
-    return sorted(result, key=lambda x: x['category_id'])
+    return ORJSONResponse(sorted(result, key=lambda x: x['category_id']))
 
 
 @router.get("/location-summary")
-def get_location_summary(
+async def get_location_summary(
     week: str,
     forecast_type: str = "monthly",
     geo_level: str = "all_locations",
     geo_id: str = "ALL"
 ):
     """Get summary metrics for a location."""
-    table = f"walmart_aggregate_{forecast_type}"
-    week_d = to_date(week)
-    window_days = 30 if forecast_type == 'monthly' else 90
-    window_start = week_d - timedelta(days=window_days - 1)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT type_id, date, value, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND geo_level = %s 
-                  AND geo_id = %s
-                  AND product_level = 'total'
-                  AND product_id = 'ALL'
-                ORDER BY type_id, date
-            ''', [window_start, week_d, geo_level, geo_id])
-            rows = cur.fetchall()
-    
-    type_rows = {'U': [], 'R': []}
-    for row in rows:
-        type_rows[row['type_id']].append(dict(row))
+    rows = await _fetch_breaks(forecast_type, week, _LOCATION_SUMMARY_SQL, [geo_level, geo_id],
+                               mv=_LOCATION_SUMMARY_MV_SQL)
     
-    units_breaks = get_band_breaks_from_rows(type_rows.get('U', []), week_d)
-    revenue_breaks = get_band_breaks_from_rows(type_rows.get('R', []), week_d)
-    
-    total_revenue = sum(r.get('value', 0) or 0 for r in type_rows.get('R', []))
+    breaks = breaks_by_item(rows)['ALL']
+    total_revenue = next((r.total for r in rows if r.type_id == 'R'), 0)
     
     return {
-        'units': units_breaks,
+        'units': breaks['U'],
         'revenue': {
-            **revenue_breaks,
+            **breaks['R'],
             'total': total_revenue
         }
     }
 
 
 @router.get("/chart/location")
-def get_chart_location(
+async def get_chart_location(
     week: str,
     forecast_type: str = "monthly",
     type_id: str = "U",
@@ -340,38 +546,12 @@ def get_chart_location(
     geo_id: str = "ALL"
 ):
     """Get chart data for location total."""
-    table = f"walmart_aggregate_{forecast_type}"
-    week_date = to_date(week)
-    period_start, period_end = get_period_range(week, forecast_type)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT date, value as actual, fv as forecast, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND type_id = %s
-                  AND geo_level = %s
-                  AND geo_id = %s
-                  AND product_level = 'total'
-                  AND product_id = 'ALL'
-                ORDER BY date
-            ''', [period_start, period_end, type_id, geo_level, geo_id])
-            rows = cur.fetchall()
-    
-    return [{
-        'date': to_date(r['date']).isoformat(),
-        'actual': float(r['actual']) if r['actual'] and to_date(r['date']) <= week_date else None,
-        'forecast': float(r['forecast']) if r['forecast'] is not None else None,
-        'ci85_low': float(r['ci85_low']) if r['ci85_low'] is not None else None,
-        'ci85_high': float(r['ci85_high']) if r['ci85_high'] is not None else None,
-        'ci95_low': float(r['ci95_low']) if r['ci95_low'] is not None else None,
-        'ci95_high': float(r['ci95_high']) if r['ci95_high'] is not None else None,
-    } for r in rows]
+    return await chart_response(forecast_type, week, type_id, _CHART_LOCATION_SQL, _CHART_LOCATION_UR_SQL,
+                                [geo_level, geo_id])
 
 
 @router.get("/chart/department")
-def get_chart_department(
+async def get_chart_department(
     week: str,
     forecast_type: str = "monthly",
     type_id: str = "U",
@@ -380,38 +560,12 @@ def get_chart_department(
     department_id: str = ""
 ):
     """Get chart data for a department."""
-    table = f"walmart_aggregate_{forecast_type}"
-    week_date = to_date(week)
-    period_start, period_end = get_period_range(week, forecast_type)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT date, value as actual, fv as forecast, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND type_id = %s
-                  AND geo_level = %s
-                  AND geo_id = %s
-                  AND product_level = 'department_id'
-                  AND product_id = %s
-                ORDER BY date
-            ''', [period_start, period_end, type_id, geo_level, geo_id, department_id])
-            rows = cur.fetchall()
-    
-    return [{
-        'date': to_date(r['date']).isoformat(),
-        'actual': float(r['actual']) if r['actual'] and to_date(r['date']) <= week_date else None,
-        'forecast': float(r['forecast']) if r['forecast'] is not None else None,
-        'ci85_low': float(r['ci85_low']) if r['ci85_low'] is not None else None,
-        'ci85_high': float(r['ci85_high']) if r['ci85_high'] is not None else None,
-        'ci95_low': float(r['ci95_low']) if r['ci95_low'] is not None else None,
-        'ci95_high': float(r['ci95_high']) if r['ci95_high'] is not None else None,
-    } for r in rows]
+    return await chart_response(forecast_type, week, type_id, _CHART_DEPARTMENT_SQL, _CHART_DEPARTMENT_UR_SQL,
+                                [geo_level, geo_id, department_id])
 
 
 @router.get("/chart/category")
-def get_chart_category(
+async def get_chart_category(
     week: str,
     forecast_type: str = "monthly",
     type_id: str = "U",
@@ -420,34 +574,8 @@ def get_chart_category(
     category_id: str = ""
 ):
     """Get chart data for a category."""
-    table = f"walmart_aggregate_{forecast_type}"
-    week_date = to_date(week)
-    period_start, period_end = get_period_range(week, forecast_type)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT date, value as actual, fv as forecast, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND type_id = %s
-                  AND geo_level = %s
-                  AND geo_id = %s
-                  AND product_level = 'category_id'
-                  AND product_id = %s
-                ORDER BY date
-            ''', [period_start, period_end, type_id, geo_level, geo_id, category_id])
-            rows = cur.fetchall()
-    
-    return [{
-        'date': to_date(r['date']).isoformat(),
-        'actual': float(r['actual']) if r['actual'] and to_date(r['date']) <= week_date else None,
-        'forecast': float(r['forecast']) if r['forecast'] is not None else None,
-        'ci85_low': float(r['ci85_low']) if r['ci85_low'] is not None else None,
-        'ci85_high': float(r['ci85_high']) if r['ci85_high'] is not None else None,
-        'ci95_low': float(r['ci95_low']) if r['ci95_low'] is not None else None,
-        'ci95_high': float(r['ci95_high']) if r['ci95_high'] is not None else None,
-    } for r in rows]
+    return await chart_response(forecast_type, week, type_id, _CHART_CATEGORY_SQL, _CHART_CATEGORY_UR_SQL,
+                                [geo_level, geo_id, category_id])
 
 
 # =============================================================================
@@ -455,132 +583,56 @@ def get_chart_category(
 # =============================================================================
 
 @router.get("/sku-list")
-def get_sku_list(forecast_type: str = "monthly"):
+async def get_sku_list(forecast_type: str = "monthly"):
     """Get list of SKUs for CA_1."""
-    table = f"walmart_ca_1_sku_final_{forecast_type}"
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            cur.execute(f'SELECT DISTINCT sku_id FROM "{table}" ORDER BY sku_id LIMIT 1000')
-            return [{'sku_id': row[0]} for row in cur.fetchall()]
+    _check_forecast_type(forecast_type)
+    async with _connect() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_SKU_LIST_SQL[forecast_type], prepare=True)
+            return [{'sku_id': row[0]} for row in await cur.fetchall()]
 
 
 @router.get("/skus")
-def get_skus(
+async def get_skus(
     week: str,
     forecast_type: str = "monthly",
     category_id: str = "",
     limit: int = 50
 ):
     """Get SKU band breaks for a category."""
-    table = f"walmart_ca_1_sku_final_{forecast_type}"
-    week_d = to_date(week)
-    window_days = 30 if forecast_type == 'monthly' else 90
-    window_start = week_d - timedelta(days=window_days - 1)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT sku_id, type_id, date, value, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND category_id = %s
-                ORDER BY sku_id, type_id, date
-            ''', [window_start, week_d, category_id])
-            rows = cur.fetchall()
-    
-    sku_data = defaultdict(lambda: {'U': [], 'R': []})
-    for row in rows:
-        sku_data[row['sku_id']][row['type_id']].append(dict(row))
-    
-    result = []
-    for sku_id, type_rows in sku_data.items():
-        units_breaks = get_band_breaks_from_rows(type_rows.get('U', []), week_d)
-        revenue_breaks = get_band_breaks_from_rows(type_rows.get('R', []), week_d)
-        total_breaks = (
-            units_breaks['upper_85'] + units_breaks['lower_85'] + 
-            revenue_breaks['lower_85']
-        )
-        result.append({
-            'sku_id': sku_id,
-            'units': units_breaks,
-            'revenue': revenue_breaks,
-            '_total_breaks': total_breaks
-        })
+    rows = await _fetch_breaks(forecast_type, week, _SKUS_SQL, [category_id, max(limit, 0)])
     
-    result.sort(key=lambda x: -x['_total_breaks'])
-    for r in result:
-        del r['_total_breaks']
-    
-    return result[:limit]
+    # breaks_by_item keeps first-seen order, i.e. the SQL ranking.
+    return ORJSONResponse([{
+        'sku_id': sku_id,
+        'units': breaks['U'],
+        'revenue': breaks['R']
+    } for sku_id, breaks in breaks_by_item(rows).items()])
 
 
 @router.get("/chart/sku")
-def get_chart_sku(
+async def get_chart_sku(
     week: str,
     forecast_type: str = "monthly",
     type_id: str = "U",
     sku_id: str = ""
 ):
     """Get chart data for a SKU."""
-    table = f"walmart_ca_1_sku_final_{forecast_type}"
-    week_date = to_date(week)
-    period_start, period_end = get_period_range(week, forecast_type)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT date, value as actual, fv as forecast, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND type_id = %s
-                  AND sku_id = %s
-                ORDER BY date
-            ''', [period_start, period_end, type_id, sku_id])
-            rows = cur.fetchall()
-    
-    return [{
-        'date': to_date(r['date']).isoformat(),
-        'actual': float(r['actual']) if r['actual'] and to_date(r['date']) <= week_date else None,
-        'forecast': float(r['forecast']) if r['forecast'] is not None else None,
-        'ci85_low': float(r['ci85_low']) if r['ci85_low'] is not None else None,
-        'ci85_high': float(r['ci85_high']) if r['ci85_high'] is not None else None,
-        'ci95_low': float(r['ci95_low']) if r['ci95_low'] is not None else None,
-        'ci95_high': float(r['ci95_high']) if r['ci95_high'] is not None else None,
-    } for r in rows]
+    return await chart_response(forecast_type, week, type_id, _CHART_SKU_SQL, _CHART_SKU_UR_SQL, [sku_id])
 
 
 @router.get("/sku-info")
-def get_sku_info(
+async def get_sku_info(
     week: str,
     forecast_type: str = "monthly",
     sku_id: str = ""
 ):
     """Get SKU info and band breaks."""
-    table = f"walmart_ca_1_sku_final_{forecast_type}"
-    week_d = to_date(week)
-    window_days = 30 if forecast_type == 'monthly' else 90
-    window_start = week_d - timedelta(days=window_days - 1)
-    
-    with _connect() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f'''
-                SELECT type_id, date, value, ci85_low, ci85_high, ci95_low, ci95_high
-                FROM "{table}"
-                WHERE date >= %s AND date <= %s 
-                  AND sku_id = %s
-                ORDER BY type_id, date
-            ''', [window_start, week_d, sku_id])
-            rows = cur.fetchall()
-    
-    type_rows = {'U': [], 'R': []}
-    for row in rows:
-        type_rows[row['type_id']].append(dict(row))
-    
-    units_breaks = get_band_breaks_from_rows(type_rows.get('U', []), week_d)
-    revenue_breaks = get_band_breaks_from_rows(type_rows.get('R', []), week_d)
+    rows = await _fetch_breaks(forecast_type, week, _SKU_INFO_SQL, [sku_id])
+    breaks = breaks_by_item(rows)[sku_id]
     
     return {
         'sku_id': sku_id,
-        'units': units_breaks,
-        'revenue': revenue_breaks
-    }
+        'units': breaks['U'],
+        'revenue': breaks['R']
+    }
\ No newline at end of file
@@ -0,0 +1,17 @@
+-- Covering index for /views/query, /views/months and /views/export
+-- (WHERE forecast_name = ? AND date range, ORDER BY date). INCLUDE carries every
+-- column in backend/routes/views.py COLS so the range is served by an index-only scan.
+--
+-- Indexes need a relation with storage: this applies as-is when engine.tsf_vw_full is
+-- a table or materialized view. If it is a plain view, create the same index on the
+-- underlying table instead.
+--
+-- CONCURRENTLY avoids blocking reads during the build (run it outside a transaction block).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tsf_vw_full_fname_date
+    ON engine.tsf_vw_full (forecast_name, date)
+    INCLUDE (value, model_name, fv, fv_mape, fv_mean_mape, fv_mean_mape_c,
+             ci85_low, ci85_high, ci90_low, ci90_high, ci95_low, ci95_high,
+             "ARIMA_M", "HWES_M", "SES_M");
+
+-- Refresh planner statistics so the new index is costed correctly.
+ANALYZE engine.tsf_vw_full;
@@ -0,0 +1,102 @@
+-- Precomputed band breaks for /departments, /categories and /location-summary
+-- (backend/routes/walmart_dashboard.py), one row per week-ending Saturday and
+-- (geo_level, geo_id, product_level, product_id, type_id). Same rules as
+-- band_breaks_sql over the same trailing window (30 days monthly, 90 quarterly),
+-- so a lookup returns what the live query would.
+--
+-- The endpoints read these views only when WALMART_BAND_BREAKS_MV=1 and the requested
+-- week is a Saturday. Refresh them after each ETL load (the /weeks and /geo-ids
+-- picker caches catch up on their own within 300 s):
+--
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY walmart_band_breaks_monthly;
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY walmart_band_breaks_quarterly;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS walmart_band_breaks_monthly AS
+WITH bounds AS (
+    SELECT MIN(date) AS lo, MAX(date) AS hi FROM walmart_aggregate_monthly
+), weeks AS (
+    -- Every Saturday whose 30-day window [week_ending - 29, week_ending] holds data
+    SELECT gs::date AS week_ending
+    FROM bounds,
+         generate_series(lo + (6 - EXTRACT(DOW FROM lo)::int) % 7, hi + 29, interval '7 days') AS gs
+), w AS (
+    SELECT k.week_ending, t.geo_level, t.geo_id, t.product_level, t.product_id, t.type_id,
+           t.date, t.value,
+           (t.value > t.ci85_high) IS TRUE AS u85,
+           (t.value > t.ci95_high) IS TRUE AS u95,
+           (t.value < t.ci85_low) IS TRUE AS l85,
+           (t.value < t.ci95_low) IS TRUE AS l95
+    FROM weeks k
+    JOIN walmart_aggregate_monthly t ON t.date BETWEEN k.week_ending - 29 AND k.week_ending
+), islands AS (
+    SELECT *,
+           COUNT(*) FILTER (WHERE value IS NOT NULL AND NOT u85) OVER k AS u85_island,
+           COUNT(*) FILTER (WHERE value IS NOT NULL AND NOT l85) OVER k AS l85_island
+    FROM w
+    WINDOW k AS (PARTITION BY week_ending, geo_level, geo_id, product_level, product_id, type_id ORDER BY date ROWS UNBOUNDED PRECEDING)
+), runs AS (
+    SELECT *,
+           COUNT(*) FILTER (WHERE u85) OVER (PARTITION BY week_ending, geo_level, geo_id, product_level, product_id, type_id, u85_island) AS u85_run,
+           COUNT(*) FILTER (WHERE l85) OVER (PARTITION BY week_ending, geo_level, geo_id, product_level, product_id, type_id, l85_island) AS l85_run
+    FROM islands
+)
+SELECT week_ending, geo_level, geo_id, product_level, product_id, type_id,
+       COUNT(*) FILTER (WHERE u85) AS upper_85,
+       COUNT(*) FILTER (WHERE u95) AS upper_95,
+       COUNT(*) FILTER (WHERE l85) AS lower_85,
+       COUNT(*) FILTER (WHERE l95) AS lower_95,
+       MAX(u85_run) AS upper_85_consec,
+       MAX(l85_run) AS lower_85_consec,
+       COUNT(value) AS total_days,
+       COALESCE(SUM(value), 0) AS total
+FROM runs
+GROUP BY week_ending, geo_level, geo_id, product_level, product_id, type_id;
+
+-- Unique key: the endpoints' point lookup, and required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS ux_walmart_band_breaks_monthly
+    ON walmart_band_breaks_monthly (geo_level, geo_id, product_level, week_ending, product_id, type_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS walmart_band_breaks_quarterly AS
+WITH bounds AS (
+    SELECT MIN(date) AS lo, MAX(date) AS hi FROM walmart_aggregate_quarterly
+), weeks AS (
+    -- Every Saturday whose 90-day window [week_ending - 89, week_ending] holds data
+    SELECT gs::date AS week_ending
+    FROM bounds,
+         generate_series(lo + (6 - EXTRACT(DOW FROM lo)::int) % 7, hi + 89, interval '7 days') AS gs
+), w AS (
+    SELECT k.week_ending, t.geo_level, t.geo_id, t.product_level, t.product_id, t.type_id,
+           t.date, t.value,
+           (t.value > t.ci85_high) IS TRUE AS u85,
+           (t.value > t.ci95_high) IS TRUE AS u95,
+           (t.value < t.ci85_low) IS TRUE AS l85,
+           (t.value < t.ci95_low) IS TRUE AS l95
+    FROM weeks k
+    JOIN walmart_aggregate_quarterly t ON t.date BETWEEN k.week_ending - 89 AND k.week_ending
+), islands AS (
+    SELECT *,
+           COUNT(*) FILTER (WHERE value IS NOT NULL AND NOT u85) OVER k AS u85_island,
+           COUNT(*) FILTER (WHERE value IS NOT NULL AND NOT l85) OVER k AS l85_island
+    FROM w
+    WINDOW k AS (PARTITION BY week_ending, geo_level, geo_id, product_level, product_id, type_id ORDER BY date ROWS UNBOUNDED PRECEDING)
+), runs AS (
+    SELECT *,
+           COUNT(*) FILTER (WHERE u85) OVER (PARTITION BY week_ending, geo_level, geo_id, product_level, product_id, type_id, u85_island) AS u85_run,
+           COUNT(*) FILTER (WHERE l85) OVER (PARTITION BY week_ending, geo_level, geo_id, product_level, product_id, type_id, l85_island) AS l85_run
+    FROM islands
+)
+SELECT week_ending, geo_level, geo_id, product_level, product_id, type_id,
+       COUNT(*) FILTER (WHERE u85) AS upper_85,
+       COUNT(*) FILTER (WHERE u95) AS upper_95,
+       COUNT(*) FILTER (WHERE l85) AS lower_85,
+       COUNT(*) FILTER (WHERE l95) AS lower_95,
+       MAX(u85_run) AS upper_85_consec,
+       MAX(l85_run) AS lower_85_consec,
+       COUNT(value) AS total_days,
+       COALESCE(SUM(value), 0) AS total
+FROM runs
+GROUP BY week_ending, geo_level, geo_id, product_level, product_id, type_id;
+
+-- Unique key: the endpoints' point lookup, and required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS ux_walmart_band_breaks_quarterly
+    ON walmart_band_breaks_quarterly (geo_level, geo_id, product_level, week_ending, product_id, type_id);
@@ -0,0 +1,51 @@
+-- Covering indexes for the walmart dashboard band-break endpoints
+-- (backend/routes/walmart_dashboard.py band_breaks_sql). Equality columns lead, then
+-- the date range, and INCLUDE carries every column the query reads, so each window
+-- is served by an index-only scan. Repeat for every forecast_type table present
+-- (walmart_aggregate_<forecast_type>, walmart_ca_1_sku_final_<forecast_type>).
+--
+-- CONCURRENTLY avoids blocking reads during the build (run it outside a transaction block).
+
+-- /departments, /categories, /location-summary
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_aggregate_monthly_breaks
+    ON walmart_aggregate_monthly (product_level, geo_level, geo_id, date, product_id, type_id)
+    INCLUDE (value, ci85_low, ci85_high, ci95_low, ci95_high);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_aggregate_quarterly_breaks
+    ON walmart_aggregate_quarterly (product_level, geo_level, geo_id, date, product_id, type_id)
+    INCLUDE (value, ci85_low, ci85_high, ci95_low, ci95_high);
+
+-- /skus
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_ca_1_sku_final_monthly_breaks
+    ON walmart_ca_1_sku_final_monthly (category_id, date, sku_id, type_id)
+    INCLUDE (value, ci85_low, ci85_high, ci95_low, ci95_high);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_ca_1_sku_final_quarterly_breaks
+    ON walmart_ca_1_sku_final_quarterly (category_id, date, sku_id, type_id)
+    INCLUDE (value, ci85_low, ci85_high, ci95_low, ci95_high);
+
+-- /chart/location, /chart/department, /chart/category: one series per
+-- (geo, product, type_id), read in date order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_aggregate_monthly_chart
+    ON walmart_aggregate_monthly (geo_level, geo_id, product_level, product_id, type_id, date)
+    INCLUDE (value, fv, ci85_low, ci85_high, ci95_low, ci95_high);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_aggregate_quarterly_chart
+    ON walmart_aggregate_quarterly (geo_level, geo_id, product_level, product_id, type_id, date)
+    INCLUDE (value, fv, ci85_low, ci85_high, ci95_low, ci95_high);
+
+-- /chart/sku and /sku-info
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_ca_1_sku_final_monthly_chart
+    ON walmart_ca_1_sku_final_monthly (sku_id, type_id, date)
+    INCLUDE (value, fv, ci85_low, ci85_high, ci95_low, ci95_high);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_walmart_ca_1_sku_final_quarterly_chart
+    ON walmart_ca_1_sku_final_quarterly (sku_id, type_id, date)
+    INCLUDE (value, fv, ci85_low, ci85_high, ci95_low, ci95_high);
+
+-- VACUUM sets the visibility map that index-only scans depend on, and ANALYZE
+-- refreshes planner statistics so the new indexes are costed correctly.
+VACUUM ANALYZE walmart_aggregate_monthly;
+VACUUM ANALYZE walmart_aggregate_quarterly;
+VACUUM ANALYZE walmart_ca_1_sku_final_monthly;
+VACUUM ANALYZE walmart_ca_1_sku_final_quarterly;